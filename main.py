@@ -1,6 +1,8 @@
 import re
 import time
 import datetime
+import itertools
+from array import array
 import asyncio
 import threading
 import json
@@ -9,6 +11,7 @@ import requests
 import uuid
 from typing import Dict, List, Tuple, Set, Optional
 from astrbot.api.all import *
+from astrbot.api import AstrBotConfig
 from astrbot.api.event import filter, AstrMessageEvent, MessageEventResult, MessageChain
 from astrbot.api.star import Context, Star, register
 import astrbot.api.message_components as Comp
@@ -16,15 +19,35 @@ from astrbot.api.message_components import At, Image
 
 @register("timedtask", "Jason.Joestar", "一个群聊定时任务提醒插件", "1.0.0", "https://github.com/advent259141/astrbot_plugin_timedtask")
 class TimedTaskPlugin(Star):
-    def __init__(self, context: Context):
+    def __init__(self, context: Context, config: AstrBotConfig = None):
         super().__init__(context)
+        self.config = config or {}
+        # 单个平台每分钟计划发送的提醒数上限，0表示不检查
+        try:
+            self.send_budget = max(0, int(self.config.get("send_budget_per_minute", 30)))
+        except (TypeError, ValueError):
+            print(f"配置项 send_budget_per_minute 无效: {self.config.get('send_budget_per_minute')}，使用默认值30")
+            self.send_budget = 30
         # 格式: {umo: [(time_str, content, task_id, countdown_days, start_date, target_id, image_paths), ...]}
         # 其中image_paths是本地图片路径列表
         self.tasks = {}
         self.next_task_ids = {}  # 每个群聊的下一个任务ID，格式: {umo: next_id}
+        # 每个会话的写锁，格式: {umo: asyncio.Lock}
+        # 写操作采用写时复制：在锁内构造新列表后整体替换self.tasks[umo]，
+        # 调度器只读取列表快照，不会被写操作阻塞，也不会读到修改到一半的列表
+        self.session_locks: Dict[str, asyncio.Lock] = {}
+        # 跨会话的二级索引，格式: {索引名: {键: {umo: [task_data, ...]}}}
+        # minute: 触发时刻(一天中的第几分钟)  target: AT目标ID  expiry: 倒计时到期日期
+        self.task_indexes: Dict[str, Dict] = {"minute": {}, "target": {}, "expiry": {}}
+        self.minute_send_counts: Dict[str, array] = {}  # 每个平台每分钟的计划发送数，与minute索引同步维护，格式: {平台名: array(1440)}
+        self.indexed_keys: Dict[str, Dict[str, Set]] = {}  # 每个会话已写入索引的键，格式: {umo: {索引名: {键, ...}}}
+        self.expiry_dates: Dict[str, List] = {}  # 每个会话各任务的倒计时到期日期，与任务列表一一对应，格式: {umo: [date或None, ...]}
+        self.render_cache: Dict[str, Tuple] = {}  # 任务列表渲染缓存，任务变更时失效，格式: {umo: (渲染日期, [任务行, ...])}
+        self.page_size = 20  # 分页显示时每页的任务数
         self.task_running = True
         self.executed_tasks = set()  # 记录已执行过的任务，避免重复执行
         self.last_day = datetime.datetime.now().day  # 记录上次执行的日期
+        self.last_cleanup_date = None  # 记录上次清理到期倒计时任务的日期
         
         # 任务保存路径 - 修改为data目录下
         self.save_path = os.path.join("data", "timedtask_tasks.json")
@@ -87,6 +110,144 @@ class TimedTaskPlugin(Star):
         # 如果所有格式都不匹配，则抛出错误
         raise ValueError("时间格式错误，支持的格式有：XX时XX分、HHMM、HH:MM")
 
+    def _get_session_lock(self, umo: str) -> asyncio.Lock:
+        """获取指定会话的写锁，不存在时创建"""
+        lock = self.session_locks.get(umo)
+        if lock is None:
+            lock = asyncio.Lock()
+            self.session_locks[umo] = lock
+        return lock
+
+    def _reassign_task_ids(self, tasks: List) -> List[Tuple]:
+        """为任务列表按顺序重新分配ID，返回新的任务列表（不修改原列表）"""
+        new_tasks = []
+        for i, task_data in enumerate(tasks):
+            if len(task_data) >= 7:  # 包含图片路径
+                time_str, content, _, countdown_days, start_date, target_id, image_paths = task_data
+                new_tasks.append((time_str, content, i, countdown_days, start_date, target_id, image_paths))
+            elif len(task_data) >= 6:  # 包含AT信息
+                time_str, content, _, countdown_days, start_date, target_id = task_data
+                new_tasks.append((time_str, content, i, countdown_days, start_date, target_id, []))
+            elif len(task_data) >= 5:  # 包含倒计时
+                time_str, content, _, countdown_days, start_date = task_data
+                new_tasks.append((time_str, content, i, countdown_days, start_date, None, []))
+            else:
+                time_str, content, _ = task_data[:3]
+                new_tasks.append((time_str, content, i, None, None, None, []))
+        return new_tasks
+
+    def _get_expiry_date(self, task_data) -> Optional[datetime.date]:
+        """计算倒计时任务的到期日期，非倒计时任务返回None"""
+        if len(task_data) < 5 or task_data[3] is None or task_data[4] is None:
+            return None
+        start_date = datetime.datetime.strptime(task_data[4], "%Y-%m-%d").date()
+        return start_date + datetime.timedelta(days=task_data[3])
+
+    def _index_session(self, umo: str):
+        """重建指定会话在二级索引中的条目"""
+        platform = self._get_platform(umo)
+        if platform not in self.minute_send_counts:
+            self.minute_send_counts[platform] = array("I", [0]) * 1440
+        send_counts = self.minute_send_counts[platform]
+        
+        # 先移除该会话旧的索引条目
+        for index_name, keys in self.indexed_keys.pop(umo, {}).items():
+            index = self.task_indexes[index_name]
+            for key in keys:
+                bucket = index.get(key)
+                if bucket is not None:
+                    removed = bucket.pop(umo, None)
+                    if index_name == "minute" and removed:
+                        send_counts[key] -= len(removed)
+                    if not bucket:
+                        del index[key]
+        
+        session_keys = {index_name: set() for index_name in self.task_indexes}
+        expiry_dates = []
+        for task_data in self.tasks.get(umo, []):
+            # 逐个任务建立索引，格式错误的任务只跳过对应的索引，不影响其他任务
+            keys = {}
+            try:
+                hour, minute = self.parse_time(task_data[0])
+                keys["minute"] = hour * 60 + minute
+            except (ValueError, TypeError, IndexError):
+                pass
+            try:
+                if len(task_data) >= 6 and task_data[5]:
+                    keys["target"] = str(task_data[5])
+            except TypeError:
+                pass
+            try:
+                expiry_date = self._get_expiry_date(task_data)
+            except (ValueError, TypeError, IndexError, OverflowError):
+                expiry_date = None
+            expiry_dates.append(expiry_date)
+            if expiry_date is not None:
+                keys["expiry"] = expiry_date
+            
+            for index_name, key in keys.items():
+                self.task_indexes[index_name].setdefault(key, {}).setdefault(umo, []).append(task_data)
+                session_keys[index_name].add(key)
+            if "minute" in keys:
+                send_counts[keys["minute"]] += 1
+        
+        self.indexed_keys[umo] = session_keys
+        self.expiry_dates[umo] = expiry_dates
+
+    def _set_session_tasks(self, umo: str, new_tasks: List):
+        """替换指定会话的任务列表并同步更新索引，调用方需持有该会话的写锁"""
+        self.tasks[umo] = new_tasks
+        self._index_session(umo)
+        self.render_cache.pop(umo, None)
+
+    def _get_platform(self, umo: str) -> str:
+        """从统一消息来源中取出平台名，格式为 平台名:消息类型:会话ID"""
+        return umo.split(":", 1)[0]
+
+    def _count_minute_sends(self, minute_of_day: int, platform: str) -> int:
+        """读取指定平台在某一分钟计划发送的提醒数"""
+        send_counts = self.minute_send_counts.get(platform)
+        return send_counts[minute_of_day] if send_counts is not None else 0
+
+    def build_send_histogram(self) -> Dict[str, array]:
+        """返回每个平台一天1440分钟的计划发送数直方图（副本），跳过没有任务的平台"""
+        return {platform: array("I", send_counts) for platform, send_counts in self.minute_send_counts.items() if any(send_counts)}
+
+    def _suggest_minute(self, minute_of_day: int, platform: str, max_offset: int = 30) -> Optional[int]:
+        """在指定分钟前后寻找最近的未超出发送预算的分钟，找不到时返回None"""
+        for offset in range(1, max_offset + 1):
+            for candidate in ((minute_of_day + offset) % 1440, (minute_of_day - offset) % 1440):
+                if self._count_minute_sends(candidate, platform) < self.send_budget:
+                    return candidate
+        return None
+
+    def _format_task_line(self, task_data, expiry_date: Optional[datetime.date], today: datetime.date) -> str:
+        """格式化任务列表中的单行任务信息"""
+        time_str, content, task_id = task_data[:3]
+        target_id = task_data[5] if len(task_data) >= 6 else None
+        image_paths = task_data[6] if len(task_data) >= 7 else []
+        
+        countdown_info = f" (剩余 {(expiry_date - today).days} 天)" if expiry_date is not None else ""
+        at_info = f" (AT用户 {target_id})" if target_id else ""
+        img_info = f" (附带 {len(image_paths)} 张图片)" if image_paths else ""
+        return f"#{task_id}: {time_str} - {content}{countdown_info}{at_info}{img_info}"
+
+    def _render_task_lines(self, umo: str) -> List[str]:
+        """获取会话的任务行列表，同一天内复用缓存，任务变更后重新渲染"""
+        today = datetime.date.today()
+        cached = self.render_cache.get(umo)
+        if cached is not None and cached[0] == today:
+            return cached[1]
+        
+        tasks = self.tasks.get(umo, [])
+        expiry_dates = self.expiry_dates.get(umo, [])
+        lines = [
+            self._format_task_line(task_data, expiry_dates[i] if i < len(expiry_dates) else None, today)
+            for i, task_data in enumerate(tasks)
+        ]
+        self.render_cache[umo] = (today, lines)
+        return lines
+
     def load_tasks(self):
         """从文件加载任务"""
         try:
@@ -116,6 +277,10 @@ class TimedTaskPlugin(Star):
             # 如果加载失败，使用空任务列表
             self.tasks = {}
             self.next_task_ids = {}
+        
+        # 索引在解析文件之外建立，索引出错不会清空已加载的任务
+        for umo in self.tasks:
+            self._index_session(umo)
 
     def save_tasks(self):
         """保存任务到文件"""
@@ -360,9 +525,21 @@ class TimedTaskPlugin(Star):
                 self.executed_tasks.clear()
                 self.last_day = now.day
             
+            # 每天（包括插件启动后的第一次检查）批量清理一次到期的倒计时任务
+            today = now.date()
+            if today != self.last_cleanup_date:
+                try:
+                    await self.cleanup_expired_tasks(today)
+                except Exception as e:
+                    print(f"清理到期任务失败: {e}")
+                self.last_cleanup_date = today
+            
             # 使用异步方式处理每个任务
             for umo, umo_tasks in list(self.tasks.items()):  # 使用list创建副本，避免修改字典时报错
-                for i, task_data in enumerate(list(umo_tasks)):  # 同样使用副本
+                # 写操作不会原地修改任务列表，umo_tasks即为该会话的只读快照，
+                # 到期日期列表与任务列表同时替换，两者一一对应
+                expiry_dates = self.expiry_dates.get(umo, [])
+                for i, task_data in enumerate(umo_tasks):
                     try:
                         # 解构任务数据，适应不同长度的元组
                         if len(task_data) >= 7:  # 包含图片路径
@@ -381,18 +558,6 @@ class TimedTaskPlugin(Star):
                             target_id = None
                             image_paths = []
                         
-                        # 检查倒计时是否已结束
-                        if countdown_days is not None and start_date is not None:
-                            start_datetime = datetime.datetime.strptime(start_date, "%Y-%m-%d")
-                            days_passed = (now.date() - start_datetime.date()).days
-                            days_left = countdown_days - days_passed
-                            
-                            # 如果倒计时结束，移除任务并继续下一个
-                            if days_left <= 0:
-                                umo_tasks.pop(i)
-                                self.save_tasks()
-                                continue
-                        
                         hour, minute = self.parse_time(time_str)
                         
                         # 创建任务执行标识
@@ -417,9 +582,10 @@ class TimedTaskPlugin(Star):
                                 reminder_text += f"👤 提醒对象：{target_id}\n"
                             
                             # 如果有倒计时，添加倒计时信息
-                            if countdown_days is not None and start_date is not None:
-                                days_passed = (now.date() - datetime.datetime.strptime(start_date, "%Y-%m-%d").date()).days
-                                days_left = countdown_days - days_passed
+                            # 到期的倒计时任务已在日期变更时统一清理，这里只取预先计算的到期日期用于显示
+                            expiry_date = expiry_dates[i] if i < len(expiry_dates) else None
+                            if expiry_date is not None:
+                                days_left = (expiry_date - today).days
                                 reminder_text += f"⌛ 倒计时：剩余 {days_left} 天\n"
                             
                             # 修复：确保任务ID后没有其他内容，单独成行
@@ -454,6 +620,57 @@ class TimedTaskPlugin(Star):
             # 等待10秒再次检查
             await asyncio.sleep(10)
 
+    async def cleanup_expired_tasks(self, today: datetime.date):
+        """根据到期日期索引批量移除所有倒计时已结束的任务
+        
+        所有会话处理完后只保存一次任务文件，并删除不再被任何任务引用的图片。
+        """
+        expiry_index = self.task_indexes["expiry"]
+        umos = {umo for expiry_date, bucket in list(expiry_index.items()) if expiry_date <= today for umo in bucket}
+        removed_tasks = []
+        
+        for umo in umos:
+            async with self._get_session_lock(umo):
+                # 在锁内重新读取索引，索引与当前任务列表同步，可按对象身份匹配
+                expired = {
+                    id(task_data)
+                    for expiry_date, bucket in list(expiry_index.items()) if expiry_date <= today
+                    for task_data in bucket.get(umo, [])
+                }
+                if not expired:
+                    continue
+                
+                tasks = self.tasks.get(umo, [])
+                removed_tasks.extend(task_data for task_data in tasks if id(task_data) in expired)
+                self._set_session_tasks(umo, [task_data for task_data in tasks if id(task_data) not in expired])
+        
+        if not removed_tasks:
+            return
+        
+        self.save_tasks()
+        print(f"已清理 {len(removed_tasks)} 个到期的倒计时任务")
+        
+        self._delete_unreferenced_images(removed_tasks)
+
+    def _delete_unreferenced_images(self, removed_tasks: List):
+        """删除已移除任务中不再被任何任务引用的本地图片，仅用于倒计时到期的任务"""
+        referenced = {
+            img_path
+            for tasks in self.tasks.values()
+            for task_data in tasks if len(task_data) >= 7
+            for img_path in task_data[6] or []
+        }
+        for task_data in removed_tasks:
+            if len(task_data) < 7:
+                continue
+            for img_path in task_data[6] or []:
+                if img_path not in referenced and os.path.exists(img_path):
+                    try:
+                        os.remove(img_path)
+                        referenced.add(img_path)
+                    except Exception as e:
+                        print(f"删除图片失败: {img_path}, 错误: {e}")
+
     @filter.command("设置任务")
     async def set_task(self, event: AstrMessageEvent, time_str: str, content: str):
         """设置定时任务，格式为 设置任务 xx时xx分 任务内容"""
@@ -467,12 +684,6 @@ class TimedTaskPlugin(Star):
             # 获取统一消息来源
             umo = event.unified_msg_origin
             
-            # 初始化该来源的任务列表和next_task_id
-            if umo not in self.tasks:
-                self.tasks[umo] = []
-            if umo not in self.next_task_ids:
-                self.next_task_ids[umo] = 0
-            
             # 检查是否有AT的目标和图片 - 收集所有AT和图片URL
             at_targets = []
             image_urls = []
@@ -501,21 +712,34 @@ class TimedTaskPlugin(Star):
                 if local_path:
                     image_paths.append(local_path)
             
-            # 分配任务ID并添加任务
-            task_id = self.next_task_ids[umo]
-            self.next_task_ids[umo] += 1
-            
-            # 任务数据现在包括7个元素：时间、内容、任务ID、倒计时天数(None)、开始日期(None)、AT目标ID、本地图片路径
-            self.tasks[umo].append((time_str, content, task_id, None, None, target_id, image_paths))
-            
-            # 保存任务到文件
-            self.save_tasks()
+            async with self._get_session_lock(umo):
+                # 分配任务ID并添加任务
+                task_id = self.next_task_ids.get(umo, 0)
+                self.next_task_ids[umo] = task_id + 1
+                
+                # 任务数据现在包括7个元素：时间、内容、任务ID、倒计时天数(None)、开始日期(None)、AT目标ID、本地图片路径
+                self._set_session_tasks(umo, self.tasks.get(umo, []) + [(time_str, content, task_id, None, None, target_id, image_paths)])
+                
+                # 保存任务到文件
+                self.save_tasks()
             
             # 使用标准化的时间格式显示
             at_info = f"，并会AT用户 {target_id}" if target_id else ""
             img_info = f"，附带 {len(image_paths)} 张图片" if image_paths else ""
             
-            yield event.plain_result(f"✅ 已设置任务 #{task_id}：将在每天 {formatted_time} 提醒「{content}」{at_info}{img_info}")
+            # 检查该分钟的计划发送数是否超出预算
+            budget_info = ""
+            if self.send_budget > 0:
+                platform = self._get_platform(umo)
+                minute_of_day = hour * 60 + minute
+                send_count = self._count_minute_sends(minute_of_day, platform)
+                if send_count > self.send_budget:
+                    budget_info = f"\n⚠️ {formatted_time} 已有 {send_count} 条提醒，超出每分钟发送预算 {self.send_budget}"
+                    suggested = self._suggest_minute(minute_of_day, platform)
+                    if suggested is not None:
+                        budget_info += f"，建议改为 {suggested // 60}时{suggested % 60}分"
+            
+            yield event.plain_result(f"✅ 已设置任务 #{task_id}：将在每天 {formatted_time} 提醒「{content}」{at_info}{img_info}{budget_info}")
         
         except ValueError as e:
             yield event.plain_result(f"❌ {str(e)}")
@@ -537,85 +761,62 @@ class TimedTaskPlugin(Star):
                 return
             
             found = False
-            for i, task_data in enumerate(self.tasks[umo]):
-                if len(task_data) >= 3 and task_data[2] == task_id:
-                    # 获取现有的任务数据
-                    if len(task_data) >= 7:  # 包含图片路径
-                        time_str, content, tid, _, _, target_id, image_paths = task_data
-                    elif len(task_data) >= 6:  # 包含AT信息
-                        time_str, content, tid, _, _, target_id = task_data
-                        image_paths = []
-                    else:
-                        time_str, content, tid = task_data[:3]
-                        target_id = None
-                        image_paths = []
-                    
-                    # 更新任务，加入倒计时信息，保留AT信息和图片路径
-                    today = datetime.datetime.now().strftime("%Y-%m-%d")
-                    self.tasks[umo][i] = (time_str, content, tid, countdown_days, today, target_id, image_paths)
-                    
-                    self.save_tasks()
-                    yield event.plain_result(f"✅ 已为任务 #{task_id} 设置 {countdown_days} 天倒计时")
-                    found = True
-                    break
+            async with self._get_session_lock(umo):
+                new_tasks = list(self.tasks.get(umo, []))
+                for i, task_data in enumerate(new_tasks):
+                    if len(task_data) >= 3 and task_data[2] == task_id:
+                        # 获取现有的任务数据
+                        if len(task_data) >= 7:  # 包含图片路径
+                            time_str, content, tid, _, _, target_id, image_paths = task_data
+                        elif len(task_data) >= 6:  # 包含AT信息
+                            time_str, content, tid, _, _, target_id = task_data
+                            image_paths = []
+                        else:
+                            time_str, content, tid = task_data[:3]
+                            target_id = None
+                            image_paths = []
+                        
+                        # 更新任务，加入倒计时信息，保留AT信息和图片路径
+                        today = datetime.datetime.now().strftime("%Y-%m-%d")
+                        new_tasks[i] = (time_str, content, tid, countdown_days, today, target_id, image_paths)
+                        self._set_session_tasks(umo, new_tasks)
+                        
+                        self.save_tasks()
+                        found = True
+                        break
             
-            if not found:
+            if found:
+                yield event.plain_result(f"✅ 已为任务 #{task_id} 设置 {countdown_days} 天倒计时")
+            else:
                 yield event.plain_result(f"❌ 未找到ID为 {task_id} 的任务")
         
         except Exception as e:
             yield event.plain_result(f"❌ 设置倒计时失败：{str(e)}")
 
     @filter.command("任务列表")
-    async def list_tasks(self, event: AstrMessageEvent):
-        """列出当前会话的所有定时任务"""
+    async def list_tasks(self, event: AstrMessageEvent, page: int = 1):
+        """列出当前会话的定时任务，格式为 任务列表 [页码]"""
         umo = event.unified_msg_origin
         
         if umo not in self.tasks or not self.tasks[umo]:
             yield event.plain_result("当前会话没有设置任何定时任务")
             return
         
-        task_list = []
-        now = datetime.datetime.now()
-        
-        for task_data in self.tasks[umo]:
-            if len(task_data) >= 7:
-                time_str, content, task_id, countdown_days, start_date, target_id, image_paths = task_data
-                if countdown_days is not None and start_date is not None:
-                    start_datetime = datetime.datetime.strptime(start_date, "%Y-%m-%d")
-                    days_passed = (now.date() - start_datetime.date()).days
-                    days_left = countdown_days - days_passed
-                    at_info = f" (AT用户 {target_id})" if target_id else ""
-                    img_info = f" (附带 {len(image_paths)} 张图片)" if image_paths else ""
-                    task_list.append(f"#{task_id}: {time_str} - {content} (剩余 {days_left} 天){at_info}{img_info}")
-                else:
-                    at_info = f" (AT用户 {target_id})" if target_id else ""
-                    img_info = f" (附带 {len(image_paths)} 张图片)" if image_paths else ""
-                    task_list.append(f"#{task_id}: {time_str} - {content}{at_info}{img_info}")
-            elif len(task_data) >= 6:
-                time_str, content, task_id, countdown_days, start_date, target_id = task_data
-                if countdown_days is not None and start_date is not None:
-                    start_datetime = datetime.datetime.strptime(start_date, "%Y-%m-%d")
-                    days_passed = (now.date() - start_datetime.date()).days
-                    days_left = countdown_days - days_passed
-                    at_info = f" (AT用户 {target_id})" if target_id else ""
-                    task_list.append(f"#{task_id}: {time_str} - {content} (剩余 {days_left} 天){at_info}")
-                else:
-                    at_info = f" (AT用户 {target_id})" if target_id else ""
-                    task_list.append(f"#{task_id}: {time_str} - {content}{at_info}")
-            elif len(task_data) >= 5:
-                time_str, content, task_id, countdown_days, start_date = task_data
-                if countdown_days is not None and start_date is not None:
-                    start_datetime = datetime.datetime.strptime(start_date, "%Y-%m-%d")
-                    days_passed = (now.date() - start_datetime.date()).days
-                    days_left = countdown_days - days_passed
-                    task_list.append(f"#{task_id}: {time_str} - {content} (剩余 {days_left} 天)")
-                else:
-                    task_list.append(f"#{task_id}: {time_str} - {content}")
-            else:
-                time_str, content, task_id = task_data[:3]
-                task_list.append(f"#{task_id}: {time_str} - {content}")
+        task_list = self._render_task_lines(umo)
+        total = len(task_list)
+        page_count = (total + self.page_size - 1) // self.page_size
+        if page < 1 or page > page_count:
+            yield event.plain_result(f"❌ 页码超出范围，共 {page_count} 页")
+            return
         
-        yield event.plain_result(f"📋 当前会话的定时任务列表：\n" + "\n".join(task_list))
+        start = (page - 1) * self.page_size
+        result = f"📋 当前会话的定时任务列表：\n" + "\n".join(task_list[start:start + self.page_size])
+        if page_count > 1:
+            result += f"\n（第 {page}/{page_count} 页，共 {total} 个任务"
+            if page < page_count:
+                result += f"，发送 任务列表 {page + 1} 查看下一页"
+            result += "）"
+        yield event.plain_result(result)
 
     @filter.command("删除任务")
     async def delete_task(self, event: AstrMessageEvent, task_id: int):
@@ -626,44 +827,29 @@ class TimedTaskPlugin(Star):
             yield event.plain_result("当前会话没有设置任何定时任务")
             return
         
-        found = False
-        for i, task_data in enumerate(self.tasks[umo]):
-            if len(task_data) >= 3 and task_data[2] == task_id:
-                # 删除指定任务
-                self.tasks[umo].pop(i)
-                found = True
-                break
+        async with self._get_session_lock(umo):
+            tasks = self.tasks.get(umo, [])
+            found = False
+            for i, task_data in enumerate(tasks):
+                if len(task_data) >= 3 and task_data[2] == task_id:
+                    # 删除指定任务
+                    remaining = tasks[:i] + tasks[i + 1:]
+                    found = True
+                    break
+            
+            if found:
+                # 自动重排剩余任务的ID，并更新任务列表和下一个任务ID
+                new_tasks = self._reassign_task_ids(remaining)
+                self._set_session_tasks(umo, new_tasks)
+                self.next_task_ids[umo] = len(new_tasks)
+                
+                # 保存任务到文件
+                self.save_tasks()
         
         if not found:
             yield event.plain_result(f"❌ 未找到ID为 {task_id} 的任务")
             return
         
-        # 自动重排剩余任务的ID
-        tasks = self.tasks[umo]
-        new_tasks = []
-        
-        # 为所有剩余任务重新分配ID
-        for i, task_data in enumerate(tasks):
-            if len(task_data) >= 7:  # 包含图片路径
-                time_str, content, _, countdown_days, start_date, target_id, image_paths = task_data
-                new_tasks.append((time_str, content, i, countdown_days, start_date, target_id, image_paths))
-            elif len(task_data) >= 6:  # 包含AT信息
-                time_str, content, _, countdown_days, start_date, target_id = task_data
-                new_tasks.append((time_str, content, i, countdown_days, start_date, target_id, []))
-            elif len(task_data) >= 5:  # 包含倒计时
-                time_str, content, _, countdown_days, start_date = task_data
-                new_tasks.append((time_str, content, i, countdown_days, start_date, None, []))
-            else:
-                time_str, content, _ = task_data[:3]
-                new_tasks.append((time_str, content, i, None, None, None, []))
-        
-        # 更新任务列表和下一个任务ID
-        self.tasks[umo] = new_tasks
-        self.next_task_ids[umo] = len(new_tasks)
-        
-        # 保存任务到文件
-        self.save_tasks()
-        
         yield event.plain_result(f"✅ 已删除任务 #{task_id} 并重新排序剩余任务ID")
 
     @filter.command("重排任务ID")
@@ -676,37 +862,123 @@ class TimedTaskPlugin(Star):
             return
         
         try:
-            # 获取当前任务列表
-            tasks = self.tasks[umo]
-            new_tasks = []
-            
-            # 为所有任务重新分配ID
-            for i, task_data in enumerate(tasks):
-                if len(task_data) >= 7:  # 包含图片路径
-                    time_str, content, _, countdown_days, start_date, target_id, image_paths = task_data
-                    new_tasks.append((time_str, content, i, countdown_days, start_date, target_id, image_paths))
-                elif len(task_data) >= 6:  # 包含AT信息
-                    time_str, content, _, countdown_days, start_date, target_id = task_data
-                    new_tasks.append((time_str, content, i, countdown_days, start_date, target_id, []))
-                elif len(task_data) >= 5:  # 包含倒计时
-                    time_str, content, _, countdown_days, start_date = task_data
-                    new_tasks.append((time_str, content, i, countdown_days, start_date, None, []))
-                else:
-                    time_str, content, _ = task_data[:3]
-                    new_tasks.append((time_str, content, i, None, None, None, []))
-            
-            # 更新任务列表和下一个任务ID
-            self.tasks[umo] = new_tasks
-            self.next_task_ids[umo] = len(new_tasks)
-            
-            # 保存任务到文件
-            self.save_tasks()
+            async with self._get_session_lock(umo):
+                # 为所有任务重新分配ID
+                new_tasks = self._reassign_task_ids(self.tasks.get(umo, []))
+                
+                # 更新任务列表和下一个任务ID
+                self._set_session_tasks(umo, new_tasks)
+                self.next_task_ids[umo] = len(new_tasks)
+                
+                # 保存任务到文件
+                self.save_tasks()
             
             yield event.plain_result(f"✅ 已重新排序 {len(new_tasks)} 个任务的ID")
         
         except Exception as e:
             yield event.plain_result(f"❌ 重排序任务失败：{str(e)}")
 
+    def _parse_minute_range(self, value: str) -> List[int]:
+        """解析时间范围，例如 "07:55-08:05"，返回范围内的分钟序号（支持跨零点）"""
+        parts = value.split("-")
+        if len(parts) == 1:
+            parts = parts * 2
+        if len(parts) != 2:
+            raise ValueError("时间范围格式错误，例如：07:55-08:05")
+        start_hour, start_minute = self.parse_time(parts[0].strip())
+        end_hour, end_minute = self.parse_time(parts[1].strip())
+        start = start_hour * 60 + start_minute
+        end = end_hour * 60 + end_minute
+        if start <= end:
+            return list(range(start, end + 1))
+        return list(range(start, 1440)) + list(range(0, end + 1))
+
+    def _iter_indexed_tasks(self, index_name: str, keys: List):
+        """按键顺序逐个产出索引中的 (umo, task_data)，不预先构建完整结果列表"""
+        index = self.task_indexes[index_name]
+        for key in keys:
+            for umo, tasks in list(index.get(key, {}).items()):
+                for task_data in tasks:
+                    yield umo, task_data
+
+    @filter.permission_type(filter.PermissionType.ADMIN)
+    @filter.command("查询任务")
+    async def query_tasks(self, event: AstrMessageEvent, query_type: str, value: str, page: int = 1):
+        """跨会话查询定时任务（管理员），格式为 查询任务 <时间|AT|到期> <值> [页码]"""
+        try:
+            if query_type == "时间":
+                index_name = "minute"
+                keys = self._parse_minute_range(value)
+            elif query_type.upper() == "AT":
+                index_name = "target"
+                keys = [value.lstrip("@")]
+            elif query_type == "到期":
+                index_name = "expiry"
+                try:
+                    keys = [datetime.datetime.strptime(value, "%Y-%m-%d").date()]
+                except ValueError:
+                    raise ValueError("日期格式错误，例如：2025-01-31")
+            else:
+                yield event.plain_result("❌ 查询类型错误，支持：时间、AT、到期")
+                return
+        except ValueError as e:
+            yield event.plain_result(f"❌ {str(e)}")
+            return
+        
+        # 只统计数量，不格式化任何任务
+        index = self.task_indexes[index_name]
+        total = sum(len(tasks) for key in keys for tasks in index.get(key, {}).values())
+        if total == 0:
+            yield event.plain_result("没有找到符合条件的定时任务")
+            return
+        
+        page_count = (total + self.page_size - 1) // self.page_size
+        if page < 1 or page > page_count:
+            yield event.plain_result(f"❌ 页码超出范围，共 {page_count} 页")
+            return
+        
+        # 跳过前面的页，只格式化当前页的任务
+        start = (page - 1) * self.page_size
+        results = itertools.islice(self._iter_indexed_tasks(index_name, keys), start, start + self.page_size)
+        task_list = []
+        for umo, task_data in results:
+            time_str, content, task_id = task_data[:3]
+            target_id = task_data[5] if len(task_data) >= 6 else None
+            at_info = f" (AT用户 {target_id})" if target_id else ""
+            task_list.append(f"[{umo}] #{task_id}: {time_str} - {content}{at_info}")
+        
+        footer = f"\n（第 {page}/{page_count} 页，共 {total} 个任务"
+        if page < page_count:
+            footer += f"，发送 查询任务 {query_type} {value} {page + 1} 查看下一页"
+        footer += "）"
+        yield event.plain_result("🔎 任务查询结果：\n" + "\n".join(task_list) + footer)
+
+    @filter.permission_type(filter.PermissionType.ADMIN)
+    @filter.command("发送负载")
+    async def send_load(self, event: AstrMessageEvent, top_n: int = 10):
+        """查看各平台每分钟计划发送数的高峰（管理员），格式为 发送负载 [显示数量]"""
+        if top_n < 1:
+            yield event.plain_result("❌ 显示数量必须大于0")
+            return
+        
+        histogram = self.build_send_histogram()
+        if not histogram:
+            yield event.plain_result("当前没有任何定时任务")
+            return
+        
+        sections = []
+        for platform, slots in sorted(histogram.items()):
+            busy = sorted((m for m in range(1440) if slots[m]), key=lambda m: slots[m], reverse=True)
+            over_budget = sum(1 for m in busy if self.send_budget > 0 and slots[m] > self.send_budget)
+            lines = [f"【{platform}】共 {sum(slots)} 条/天，{len(busy)} 个分钟有发送，{over_budget} 个分钟超出预算"]
+            for m in busy[:top_n]:
+                warning = " ⚠️" if self.send_budget > 0 and slots[m] > self.send_budget else ""
+                lines.append(f"  {m // 60:02d}:{m % 60:02d} - {slots[m]} 条{warning}")
+            sections.append("\n".join(lines))
+        
+        budget_text = f"每分钟发送预算 {self.send_budget}" if self.send_budget > 0 else "未设置每分钟发送预算"
+        yield event.plain_result(f"📊 每日发送负载预测（{budget_text}）：\n" + "\n".join(sections))
+
     @filter.command("timedtask_help")
     async def help_command(self, event: AstrMessageEvent):
         """显示定时任务插件的帮助信息"""
@@ -719,8 +991,9 @@ class TimedTaskPlugin(Star):
    例如: 设置任务 8时30分 早会提醒 [图片]
    说明: 创建一个每天固定时间的提醒任务，可以@指定用户，也可以包含图片
 
-2️⃣ 任务列表
-   说明: 显示当前会话的所有定时任务
+2️⃣ 任务列表 [页码]
+   例如: 任务列表 2
+   说明: 显示当前会话的定时任务，任务较多时分页显示
 
 3️⃣ 删除任务 <任务ID>
    例如: 删除任务 1
@@ -733,7 +1006,17 @@ class TimedTaskPlugin(Star):
 5️⃣ 重排任务ID
    说明: 手动重新排序当前会话的所有任务ID，使其连续
 
-6️⃣ timedtask_help
+6️⃣ 查询任务 <时间|AT|到期> <值> [页码]
+   例如: 查询任务 时间 07:55-08:05
+   例如: 查询任务 AT 123456 2
+   例如: 查询任务 到期 2025-01-31
+   说明: 跨所有会话查询任务，仅管理员可用，结果分页显示
+
+7️⃣ 发送负载 [显示数量]
+   例如: 发送负载 5
+   说明: 按平台显示每天计划发送最多的分钟，标出超出发送预算的时段，仅管理员可用
+
+8️⃣ timedtask_help
    说明: 显示此帮助信息
 
 【时间格式】
@@ -747,8 +1030,9 @@ class TimedTaskPlugin(Star):
 · 任务会在每天设定的时间提醒
 · 可以在内容中@用户，提醒时会自动AT该用户
 · 可以在设置任务时包含图片，提醒时会一并发送
-· 倒计时任务会显示剩余天数
+· 倒计时任务会显示剩余天数，倒计时结束后任务及其图片会自动清理
 · 删除任务后会自动重排序剩余任务ID
+· 某一分钟的提醒超出发送预算时，设置任务会给出提示并推荐相邻时间
 · 插件重启后任务不会丢失
 """
         yield event.plain_result(help_text)
@@ -0,0 +1,107 @@
+import asyncio
+import os
+import sys
+import types
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+def _install_stubs():
+    """为测试环境提供最小化的 astrbot.api 和 requests 替身"""
+    try:
+        import astrbot.api.event  # noqa: F401
+        return
+    except ImportError:
+        pass
+
+    class _Filter:
+        class PermissionType:
+            ADMIN = "admin"
+
+        def command(self, *args, **kwargs):
+            return lambda func: func
+
+        def permission_type(self, *args, **kwargs):
+            return lambda func: func
+
+    class AstrMessageEvent:
+        def __init__(self, umo, message=()):
+            self.unified_msg_origin = umo
+            self.message_obj = types.SimpleNamespace(message=list(message))
+
+        def plain_result(self, text):
+            return text
+
+    class MessageChain(list):
+        pass
+
+    class Context:
+        def __init__(self):
+            self.sent = []
+
+        async def send_message(self, umo, message):
+            self.sent.append((umo, message))
+            await asyncio.sleep(0)
+
+    class Star:
+        def __init__(self, context):
+            self.context = context
+
+    def register(*args, **kwargs):
+        return lambda cls: cls
+
+    class At:
+        def __init__(self, qq):
+            self.qq = qq
+
+    class Image:
+        url = None
+
+        @staticmethod
+        def fromFileSystem(path):
+            return path
+
+    class Plain:
+        def __init__(self, text):
+            self.text = text
+
+    modules = {
+        "astrbot": types.ModuleType("astrbot"),
+        "astrbot.api": types.ModuleType("astrbot.api"),
+        "astrbot.api.all": types.ModuleType("astrbot.api.all"),
+        "astrbot.api.event": types.ModuleType("astrbot.api.event"),
+        "astrbot.api.star": types.ModuleType("astrbot.api.star"),
+        "astrbot.api.message_components": types.ModuleType("astrbot.api.message_components"),
+    }
+    modules["astrbot.api"].AstrBotConfig = dict
+    event = modules["astrbot.api.event"]
+    event.filter = _Filter()
+    event.AstrMessageEvent = AstrMessageEvent
+    event.MessageEventResult = object
+    event.MessageChain = MessageChain
+    star = modules["astrbot.api.star"]
+    star.Context = Context
+    star.Star = Star
+    star.register = register
+    components = modules["astrbot.api.message_components"]
+    components.At = At
+    components.Image = Image
+    components.Plain = Plain
+    sys.modules.update(modules)
+    sys.modules.setdefault("requests", types.ModuleType("requests"))
+
+
+_install_stubs()
+
+
+@pytest.fixture
+def plugin_env(tmp_path, monkeypatch):
+    """在临时目录中运行插件，并让 check_tasks 的等待立即返回"""
+    monkeypatch.chdir(tmp_path)
+    real_sleep = asyncio.sleep
+    monkeypatch.setattr(asyncio, "sleep", lambda delay: real_sleep(0))
+    return tmp_path
@@ -0,0 +1,114 @@
+import asyncio
+import datetime
+import json
+import os
+import random
+
+from astrbot.api.event import AstrMessageEvent
+from astrbot.api.star import Context
+
+import main
+
+SESSIONS = [f"qq:GroupMessage:{i}" for i in range(5)]
+
+
+async def _drain(gen):
+    return [result async for result in gen]
+
+
+def _write_preload(today):
+    """预置任务：每个会话一个普通任务，第一个会话额外带一个已到期和一个未到期的倒计时任务"""
+    expired_start = (today - datetime.timedelta(days=10)).strftime("%Y-%m-%d")
+    tasks = {umo: [["08:00", f"preload-{umo}", 0, None, None, None, []]] for umo in SESSIONS}
+    tasks[SESSIONS[0]].append(["08:00", "expired", 1, 3, expired_start, None, []])
+    tasks[SESSIONS[0]].append(["08:00", "countdown", 2, 30, today.strftime("%Y-%m-%d"), "10001", []])
+    next_task_ids = {umo: len(umo_tasks) for umo, umo_tasks in tasks.items()}
+    os.makedirs("data", exist_ok=True)
+    with open(os.path.join("data", "timedtask_tasks.json"), "w", encoding="utf-8") as f:
+        json.dump({"tasks": tasks, "next_task_ids": next_task_ids}, f)
+
+
+def test_concurrent_mutations_with_running_scheduler(plugin_env, monkeypatch):
+    # 每次变更都整体重写任务文件会让测试很慢，这里只验证内存中的状态
+    monkeypatch.setattr(main.TimedTaskPlugin, "save_tasks", lambda self: None)
+
+    async def scenario():
+        now = datetime.datetime.now()
+        _write_preload(now.date())
+        plugin = main.TimedTaskPlugin(Context())
+        rng = random.Random(26)
+        # 一部分任务设在当前分钟，让调度器在变更过程中实际发送提醒
+        times = [f"{now.hour:02d}:{now.minute:02d}", "08:00", "12:30", "23:59"]
+        expected = {umo: 2 if umo == SESSIONS[0] else 1 for umo in SESSIONS}
+
+        async def op(n):
+            umo = rng.choice(SESSIONS)
+            kind = rng.choice(["set", "set", "delete", "countdown", "reorder"])
+            event = AstrMessageEvent(umo)
+            if kind == "set":
+                replies = await _drain(plugin.set_task(event, rng.choice(times), f"task-{n}"))
+            elif kind == "delete":
+                replies = await _drain(plugin.delete_task(event, rng.randrange(0, 40)))
+            elif kind == "countdown":
+                replies = await _drain(plugin.set_task_countdown(event, rng.randrange(0, 40), rng.randrange(1, 10)))
+            else:
+                replies = await _drain(plugin.reorder_task_ids(event))
+            if replies[0].startswith("✅"):
+                expected[umo] += {"set": 1, "delete": -1}.get(kind, 0)
+            await asyncio.sleep(0)
+
+        await asyncio.gather(*(op(n) for n in range(3000)))
+        for _ in range(5):
+            await asyncio.sleep(0)
+        plugin.task_running = False
+        return plugin, expected
+
+    plugin, expected = asyncio.run(scenario())
+
+    for umo in SESSIONS:
+        tasks = plugin.tasks[umo]
+        assert len(tasks) == expected[umo]
+        assert len(plugin.expiry_dates[umo]) == len(tasks)
+        assert len({task[2] for task in tasks}) == len(tasks)
+        assert "expired" not in {task[1] for task in tasks}
+        minute_total = sum(len(bucket.get(umo, [])) for bucket in plugin.task_indexes["minute"].values())
+        assert minute_total == len(tasks)
+        expiry_total = sum(len(bucket.get(umo, [])) for bucket in plugin.task_indexes["expiry"].values())
+        assert expiry_total == sum(1 for task in tasks if task[3] is not None)
+
+
+def test_writes_wait_for_held_session_lock(plugin_env, monkeypatch):
+    monkeypatch.setattr(main.TimedTaskPlugin, "save_tasks", lambda self: None)
+    umo = SESSIONS[0]
+    other = SESSIONS[1]
+    now = datetime.datetime.now()
+
+    async def scenario():
+        plugin = main.TimedTaskPlugin(Context())
+        await _drain(plugin.set_task(AstrMessageEvent(umo), f"{now.hour:02d}:{now.minute:02d}", "held"))
+        snapshot = plugin.tasks[umo]
+
+        async with plugin._get_session_lock(umo):
+            writers = [asyncio.ensure_future(_drain(plugin.set_task(AstrMessageEvent(umo), "08:00", f"task-{n}")))
+                       for n in range(20)]
+            writers.append(asyncio.ensure_future(_drain(plugin.delete_task(AstrMessageEvent(umo), 0))))
+            # 持有锁期间多次让出事件循环：同一会话的写操作必须等待，其他会话和调度器不受影响
+            for _ in range(10):
+                await asyncio.sleep(0)
+            blocked = plugin.tasks[umo] is snapshot and not any(writer.done() for writer in writers)
+            await _drain(plugin.set_task(AstrMessageEvent(other), "08:00", "other"))
+            other_done = len(plugin.tasks[other]) == 1
+            sent_while_held = list(plugin.context.sent)
+
+        await asyncio.gather(*writers)
+        plugin.task_running = False
+        return plugin, blocked, other_done, sent_while_held
+
+    plugin, blocked, other_done, sent_while_held = asyncio.run(scenario())
+
+    assert blocked
+    assert other_done
+    assert sent_while_held or datetime.datetime.now().minute != now.minute
+    # 等待中的写操作按到达顺序依次执行：20次追加之后删除最初的任务并重排ID
+    assert [task[1] for task in plugin.tasks[umo]] == [f"task-{n}" for n in range(20)]
+    assert [task[2] for task in plugin.tasks[umo]] == list(range(20))
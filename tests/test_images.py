@@ -0,0 +1,69 @@
+import asyncio
+import datetime
+
+from astrbot.api.event import AstrMessageEvent
+from astrbot.api.star import Context
+
+import main
+
+UMO = "qq:GroupMessage:1"
+
+
+async def _drain(gen):
+    return [result async for result in gen]
+
+
+def _add_image_task(plugin, content, img_path, countdown_days=None):
+    """直接写入一个带图片的任务，避免在测试中下载图片"""
+    task_id = plugin.next_task_ids.get(UMO, 0)
+    plugin.next_task_ids[UMO] = task_id + 1
+    start_date = datetime.date.today().strftime("%Y-%m-%d") if countdown_days else None
+    task = ("08:00", content, task_id, countdown_days, start_date, None, [img_path])
+    plugin._set_session_tasks(UMO, plugin.tasks.get(UMO, []) + [task])
+
+
+def test_expiry_removes_unreferenced_images_and_delete_keeps_them(plugin_env):
+    async def scenario():
+        plugin = main.TimedTaskPlugin(Context())
+        plugin.task_running = False
+        paths = []
+        for name in ("deleted", "expired", "shared"):
+            path = plugin_env / f"{name}.jpg"
+            path.write_bytes(b"")
+            paths.append(str(path))
+        _add_image_task(plugin, "deleted", paths[0])
+        _add_image_task(plugin, "expired", paths[1], countdown_days=1)
+        _add_image_task(plugin, "expired-shared", paths[2], countdown_days=1)
+        _add_image_task(plugin, "keeps-shared", paths[2])
+
+        await _drain(plugin.delete_task(AstrMessageEvent(UMO), 0))
+        await plugin.cleanup_expired_tasks(datetime.date.today() + datetime.timedelta(days=1))
+        return plugin, paths
+
+    plugin, paths = asyncio.run(scenario())
+
+    assert [task[1] for task in plugin.tasks[UMO]] == ["keeps-shared"]
+    assert [p for p in paths if (plugin_env / p).exists()] == [paths[0], paths[2]]
+
+
+def test_cleanup_failure_does_not_stop_scheduler(plugin_env, monkeypatch):
+    async def failing_cleanup(self, today):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(main.TimedTaskPlugin, "cleanup_expired_tasks", failing_cleanup)
+    now = datetime.datetime.now()
+
+    async def scenario():
+        plugin = main.TimedTaskPlugin(Context())
+        await _drain(plugin.set_task(AstrMessageEvent(UMO), f"{now.hour:02d}:{now.minute:02d}", "still fires"))
+        plugin.last_cleanup_date = None
+        for _ in range(5):
+            await asyncio.sleep(0)
+        plugin.task_running = False
+        return plugin
+
+    plugin = asyncio.run(scenario())
+
+    # 清理失败后调度循环仍继续运行，并记录当天已尝试清理
+    assert plugin.last_cleanup_date == datetime.date.today()
+    assert plugin.context.sent or datetime.datetime.now().minute != now.minute
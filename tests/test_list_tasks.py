@@ -0,0 +1,50 @@
+import asyncio
+import datetime
+
+from astrbot.api.event import AstrMessageEvent
+from astrbot.api.star import Context
+
+import main
+
+
+async def _drain(gen):
+    return [result async for result in gen]
+
+
+def _new_plugin():
+    plugin = main.TimedTaskPlugin(Context())
+    plugin.task_running = False
+    return plugin
+
+
+def test_list_tasks_pages_and_render_cache(plugin_env):
+    umo = "qq:GroupMessage:1"
+
+    async def scenario():
+        plugin = _new_plugin()
+        plugin.page_size = 2
+        event = AstrMessageEvent(umo)
+        for i in range(3):
+            await _drain(plugin.set_task(event, "08:00", f"task-{i}"))
+        first = await _drain(plugin.list_tasks(event))
+        last = await _drain(plugin.list_tasks(event, 2))
+        out_of_range = await _drain(plugin.list_tasks(event, 3))
+        cached = plugin.render_cache[umo]
+        await _drain(plugin.set_task_countdown(event, 0, 5))
+        invalidated = umo not in plugin.render_cache
+        after_mutation = await _drain(plugin.list_tasks(event))
+        # 模拟跨天：缓存日期过期后应重新计算剩余天数
+        yesterday = datetime.date.today() - datetime.timedelta(days=1)
+        plugin.render_cache[umo] = (yesterday, ["stale"])
+        after_rollover = await _drain(plugin.list_tasks(event))
+        return first, last, out_of_range, cached, invalidated, after_mutation, after_rollover
+
+    first, last, out_of_range, cached, invalidated, after_mutation, after_rollover = asyncio.run(scenario())
+
+    assert first[0].endswith("#1: 08:00 - task-1\n（第 1/2 页，共 3 个任务，发送 任务列表 2 查看下一页）")
+    assert last[0].endswith("#2: 08:00 - task-2\n（第 2/2 页，共 3 个任务）")
+    assert out_of_range == ["❌ 页码超出范围，共 2 页"]
+    assert cached[0] == datetime.date.today() and len(cached[1]) == 3
+    assert invalidated
+    assert "#0: 08:00 - task-0 (剩余 5 天)" in after_mutation[0]
+    assert "stale" not in after_rollover[0] and "(剩余 5 天)" in after_rollover[0]
@@ -0,0 +1,66 @@
+import asyncio
+import datetime
+import json
+import os
+
+from astrbot.api.event import AstrMessageEvent
+from astrbot.api.star import Context
+
+import main
+
+
+async def _drain(gen):
+    return [result async for result in gen]
+
+
+def _new_plugin():
+    plugin = main.TimedTaskPlugin(Context())
+    plugin.task_running = False
+    return plugin
+
+
+def test_malformed_record_does_not_clear_store(plugin_env):
+    tasks = {"qq:GroupMessage:1": [
+        ["08:00", "good", 0, None, None, "10001", []],
+        ["08:00", "bad", 1, "5", "2025-01-01", None, []],
+    ]}
+    os.makedirs("data", exist_ok=True)
+    with open(os.path.join("data", "timedtask_tasks.json"), "w", encoding="utf-8") as f:
+        json.dump({"tasks": tasks, "next_task_ids": {"qq:GroupMessage:1": 2}}, f)
+
+    async def scenario():
+        return _new_plugin()
+
+    plugin = asyncio.run(scenario())
+
+    assert [task[1] for task in plugin.tasks["qq:GroupMessage:1"]] == ["good", "bad"]
+    assert plugin.expiry_dates["qq:GroupMessage:1"] == [None, None]
+    assert len(plugin.task_indexes["minute"][8 * 60]["qq:GroupMessage:1"]) == 2
+
+
+def test_query_minute_range_wraps_midnight_and_pages(plugin_env):
+    async def scenario():
+        plugin = _new_plugin()
+        plugin.page_size = 2
+        for umo, time_str, content in [
+            ("qq:GroupMessage:1", "23:59", "late"),
+            ("qq:GroupMessage:2", "00:00", "midnight"),
+            ("qq:GroupMessage:1", "08:00", "morning"),
+            ("qq:GroupMessage:2", "08:01", "outside"),
+            ("qq:GroupMessage:1", "12:00", "noon"),
+        ]:
+            await _drain(plugin.set_task(AstrMessageEvent(umo), time_str, content))
+        admin = AstrMessageEvent("admin")
+        pages = [await _drain(plugin.query_tasks(admin, "时间", "23:58-08:00", page)) for page in (1, 2, 3)]
+        bad_date = await _drain(plugin.query_tasks(admin, "到期", "bad"))
+        return plugin, pages, bad_date
+
+    plugin, pages, bad_date = asyncio.run(scenario())
+
+    assert plugin._parse_minute_range("23:58-00:01") == [1438, 1439, 0, 1]
+    assert "late" in pages[0][0] and "midnight" in pages[0][0]
+    assert "（第 1/2 页，共 3 个任务，发送 查询任务 时间 23:58-08:00 2 查看下一页）" in pages[0][0]
+    assert "morning" in pages[1][0] and "late" not in pages[1][0]
+    assert pages[1][0].endswith("（第 2/2 页，共 3 个任务）")
+    assert pages[2] == ["❌ 页码超出范围，共 2 页"]
+    assert bad_date == ["❌ 日期格式错误，例如：2025-01-31"]
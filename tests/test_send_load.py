@@ -0,0 +1,60 @@
+import asyncio
+
+from astrbot.api.event import AstrMessageEvent
+from astrbot.api.star import Context
+
+import main
+
+
+async def _drain(gen):
+    return [result async for result in gen]
+
+
+def test_send_histogram_and_top_n_validation(plugin_env):
+    async def scenario():
+        plugin = main.TimedTaskPlugin(Context(), {"send_budget_per_minute": 1})
+        plugin.task_running = False
+        await _drain(plugin.set_task(AstrMessageEvent("qq:GroupMessage:1"), "08:00", "a"))
+        replies = await _drain(plugin.set_task(AstrMessageEvent("qq:GroupMessage:2"), "08:00", "b"))
+        await _drain(plugin.set_task(AstrMessageEvent("tg:GroupMessage:1"), "23:59", "c"))
+        invalid = [await _drain(plugin.send_load(AstrMessageEvent("admin"), n)) for n in (0, -3)]
+        return plugin, replies, invalid
+
+    plugin, replies, invalid = asyncio.run(scenario())
+
+    histogram = plugin.build_send_histogram()
+    assert {platform: len(slots) for platform, slots in histogram.items()} == {"qq": 1440, "tg": 1440}
+    assert histogram["qq"][8 * 60] == 2
+    assert histogram["tg"][1439] == 1
+    assert "建议改为 8时1分" in replies[0]
+    assert all(result[0].startswith("❌") for result in invalid)
+
+
+def test_minute_send_counts_follow_mutations(plugin_env):
+    async def scenario():
+        plugin = main.TimedTaskPlugin(Context())
+        plugin.task_running = False
+        event = AstrMessageEvent("qq:GroupMessage:1")
+        for time_str in ("08:00", "08:00", "09:00"):
+            await _drain(plugin.set_task(event, time_str, "a"))
+        await _drain(plugin.delete_task(event, 0))
+        return plugin
+
+    plugin = asyncio.run(scenario())
+
+    assert plugin._count_minute_sends(8 * 60, "qq") == 1
+    assert plugin._count_minute_sends(9 * 60, "qq") == 1
+    assert plugin._count_minute_sends(8 * 60, "tg") == 0
+    assert sum(plugin.build_send_histogram()["qq"]) == 2
+
+
+def test_invalid_send_budget_falls_back(plugin_env):
+    async def scenario():
+        plugins = [main.TimedTaskPlugin(Context(), {"send_budget_per_minute": value}) for value in ("many", None, -5)]
+        for plugin in plugins:
+            plugin.task_running = False
+        return plugins
+
+    plugins = asyncio.run(scenario())
+
+    assert [plugin.send_budget for plugin in plugins] == [30, 30, 0]